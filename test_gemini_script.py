@@ -1,18 +1,59 @@
 # Test Script for Gemini API - Shows Input/Output Structure
 # pip install google-genai python-dotenv
 
+import functools
+import io
 import os
 import json
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables
-load_dotenv()
+# orjson parses LLM payloads several times faster than stdlib json and its
+# pretty-printer avoids the indent overhead of json.dumps; fall back to stdlib
+# when it isn't installed. orjson.JSONDecodeError subclasses the stdlib type.
+try:
+    import orjson
 
-def display_system_prompt():
-    """Show the exact system prompt being used"""
-    system_prompt = """You are an expert chef and nutritionist AI. When users provide ingredients, you must:
+    def _loads(raw):
+        return orjson.loads(raw)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _loads(raw):
+        return json.loads(raw)
+
+    def _dumps(obj):
+        # ensure_ascii=False skips the extra escape pass over unicode
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
+# The genai SDK (and .env loading) is imported lazily inside
+# test_recipe_generation so the no-API paths — printing the prompt, the
+# requirements checklist, a missing-key bailout — don't pay the multi-hundred
+# millisecond grpc/protobuf/auth import cost.
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key):
+    """Memoize client construction per key; TLS/auth set-up is the warm-start
+    cost when this runs repeatedly in one process (benchmark loops, wrappers)"""
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+@functools.lru_cache(maxsize=4)
+def _get_chat(api_key, system_prompt, model="gemini-2.5-flash", temperature=0.7):
+    """Memoize the chat session for a given client/prompt/model combination"""
+    from google.genai import types
+    return _get_client(api_key).chats.create(
+        model=model,
+        config=types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            temperature=temperature,
+            response_mime_type="application/json"
+        )
+    )
+
+# Built once at module scope (and interned), which also keeps it a cheap,
+# stable cache key for _get_chat
+SYSTEM_PROMPT = """You are an expert chef and nutritionist AI. When users provide ingredients, you must:
 
 IMPORTANT: Always respond with valid JSON format only, no additional text.
 
@@ -55,43 +96,104 @@ Requirements:
 - Give practical cooking tips
 - Ensure all recipes are different from each other
 - ALWAYS respond in valid JSON format only"""
-    
+
+# Required recipe fields and their expected types, hoisted to module scope so
+# the fallback validation loop doesn't rebuild the table per recipe
+REQUIRED_FIELDS = (
+    ('recipe_name', str),
+    ('ingredients', list),
+    ('instructions', list),
+    ('cooking_time_minutes', int),
+    ('difficulty_level', str),
+    ('servings', int),
+    ('nutritional_info', dict),
+    ('cooking_tips', list),
+)
+_MISSING = object()
+
+# fastjsonschema compiles the schema to a pure-Python closure once at import,
+# replacing the per-field type() loop with a single call; fall back to the
+# Python loop when it isn't installed or when validation fails (so the
+# detailed per-field report still explains what's wrong).
+try:
+    import fastjsonschema
+
+    _VALIDATE = fastjsonschema.compile({
+        "type": "object",
+        "required": ["recipes"],
+        "properties": {
+            "recipes": {
+                "type": "array",
+                "minItems": 2,
+                "maxItems": 3,
+                "items": {
+                    "type": "object",
+                    "required": [field for field, _ in REQUIRED_FIELDS],
+                    "properties": {
+                        "recipe_name": {"type": "string"},
+                        "ingredients": {"type": "array"},
+                        "instructions": {"type": "array"},
+                        "cooking_time_minutes": {"type": "integer"},
+                        "difficulty_level": {"type": "string"},
+                        "servings": {"type": "integer"},
+                        "nutritional_info": {
+                            "type": "object",
+                            "required": ["calories_per_serving", "protein_grams", "carbs_grams", "fat_grams"]
+                        },
+                        "cooking_tips": {"type": "array"}
+                    }
+                }
+            }
+        }
+    })
+except ImportError:
+    _VALIDATE = None
+
+# The static parts of the user prompt never change, so keep one template and
+# only interpolate the per-call pieces instead of rebuilding the whole string
+_PROMPT_TEMPLATE = """Generate 2-3 recipe suggestions using these ingredients: {ing}
+
+Additional requirements:
+{ctx}
+
+Remember to respond with valid JSON format only, following the exact structure specified in the system instructions."""
+
+def display_system_prompt():
+    """Show the exact system prompt being used"""
     print("="*80)
     print("🔍 SYSTEM PROMPT STRUCTURE")
     print("="*80)
-    print(system_prompt)
+    print(SYSTEM_PROMPT)
     print("="*80)
-    return system_prompt
+    return SYSTEM_PROMPT
 
 def test_recipe_generation():
     """Test the recipe generation with real API call"""
-    
-    # Get API key
+
+    # Get API key. When the environment already has it (CI), skip .env
+    # entirely; otherwise read exactly the sibling .env instead of letting
+    # load_dotenv stat its way up the directory tree looking for one.
+    if not os.getenv("GEMINI_API_KEY"):
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"), override=False)
+
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         print("❌ GEMINI_API_KEY not found!")
         print("Create a .env file with: GEMINI_API_KEY=your_api_key_here")
         return
-    
+
     print("✅ API Key found in environment")
-    
+
     try:
         # Show system prompt
         system_prompt = display_system_prompt()
-        
-        # Initialize Gemini client
-        print("\n🤖 INITIALIZING GEMINI CLIENT...")
-        client = genai.Client(api_key=api_key)
-        
-        # Create chat with JSON output enforced
-        chat = client.chats.create(
-            model="gemini-2.5-flash",
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                temperature=0.7,
-                response_mime_type="application/json"
-            )
-        )
+
+        # Initialize Gemini client and chat (memoized; repeat runs in the
+        # same process skip client init entirely). The genai SDK import is
+        # deferred into the factories — it is the slow part of start-up.
+        print("\n🤖 INITIALIZING GEMINI CLIENT...", flush=True)
+        chat = _get_chat(api_key, system_prompt)
         print("✅ Chat session created successfully")
         
         # Test with sample ingredients
@@ -102,14 +204,9 @@ Difficulty level: Easy
 Cooking time: Under 30 mins
 Additional notes: I want something healthy and filling for dinner"""
         
-        # Create user prompt
-        user_prompt = f"""Generate 2-3 recipe suggestions using these ingredients: {test_ingredients}
+        # Create user prompt from the module-level template
+        user_prompt = _PROMPT_TEMPLATE.format_map({"ing": test_ingredients, "ctx": additional_context})
 
-Additional requirements:
-{additional_context}
-
-Remember to respond with valid JSON format only, following the exact structure specified in the system instructions."""
-        
         print("\n📝 INPUT BEING SENT TO LLM:")
         print("-" * 50)
         print("INGREDIENTS:", test_ingredients)
@@ -117,80 +214,106 @@ Remember to respond with valid JSON format only, following the exact structure s
         print("\nFULL PROMPT:")
         print(user_prompt)
         
-        # Send request to LLM
-        print("\n🚀 SENDING REQUEST TO GEMINI...")
-        response = chat.send_message(user_prompt)
-        raw_response = response.text
-        
-        print("\n📤 RAW LLM RESPONSE:")
+        # Send request to LLM, streaming chunks as they arrive so the first
+        # bytes show up in hundreds of ms instead of after the full response.
+        # JSON output is enforced, so the concatenated chunks parse as-is.
+        print("\n🚀 SENDING REQUEST TO GEMINI...", flush=True)
+
+        print("\n📤 RAW LLM RESPONSE (streamed):")
         print("-" * 50)
-        print(raw_response)
+        chunks = []
+        for chunk in chat.send_message_stream(user_prompt):
+            if chunk.text:
+                chunks.append(chunk.text)
+                sys.stdout.write(chunk.text)
+                sys.stdout.flush()
+        sys.stdout.write("\n")
+        raw_response = "".join(chunks)
         
         # Try to parse JSON
-        print("\n🔧 PARSING JSON RESPONSE...")
+        print("\n🔧 PARSING JSON RESPONSE...", flush=True)
         try:
-            parsed_json = json.loads(raw_response)
-            print("✅ JSON PARSING SUCCESSFUL!")
-            
-            print("\n📊 PARSED AND FORMATTED OUTPUT:")
-            print("-" * 50)
-            print(json.dumps(parsed_json, indent=2))
-            
+            parsed_json = _loads(raw_response)
+
+            # Buffer the whole validation report and emit it with one write:
+            # dozens of per-line prints each take the stdout lock and issue a
+            # syscall, and interleave under concurrent runs
+            buf = io.StringIO()
+            out = buf.write
+            out("✅ JSON PARSING SUCCESSFUL!\n")
+
+            out("\n📊 PARSED AND FORMATTED OUTPUT:\n")
+            out("-" * 50 + "\n")
+            out(_dumps(parsed_json) + "\n")
+
             # Validate the structure
-            print("\n✅ VALIDATION RESULTS:")
-            print("-" * 50)
-            
+            out("\n✅ VALIDATION RESULTS:\n")
+            out("-" * 50 + "\n")
+
             if 'recipes' in parsed_json:
                 recipes = parsed_json['recipes']
-                print(f"✅ Found {len(recipes)} recipes")
-                
-                # Check each recipe
-                for i, recipe in enumerate(recipes, 1):
-                    print(f"\n📝 Recipe {i}: {recipe.get('recipe_name', 'NO NAME')}")
-                    
-                    # Check required fields
-                    required_fields = {
-                        'recipe_name': str,
-                        'ingredients': list,
-                        'instructions': list,
-                        'cooking_time_minutes': int,
-                        'difficulty_level': str,
-                        'servings': int,
-                        'nutritional_info': dict,
-                        'cooking_tips': list
-                    }
-                    
-                    for field, expected_type in required_fields.items():
-                        if field in recipe:
-                            actual_type = type(recipe[field])
-                            if actual_type == expected_type:
-                                print(f"  ✅ {field}: {actual_type.__name__} ✓")
-                            else:
-                                print(f"  ⚠️ {field}: {actual_type.__name__} (expected {expected_type.__name__})")
-                        else:
-                            print(f"  ❌ {field}: MISSING")
-                    
-                    # Check nutritional info specifically
-                    if 'nutritional_info' in recipe:
-                        nutrition = recipe['nutritional_info']
-                        nutrition_fields = ['calories_per_serving', 'protein_grams', 'carbs_grams', 'fat_grams']
-                        print(f"  📊 Nutritional Info Check:")
-                        for nfield in nutrition_fields:
-                            if nfield in nutrition:
-                                print(f"    ✅ {nfield}: {nutrition[nfield]}")
+                out(f"✅ Found {len(recipes)} recipes\n")
+
+                # Fast path: one compiled-validator call covers everything
+                # the loop below checks; the per-field Python loop only runs
+                # as an explanatory fallback when validation fails
+                validated = False
+                if _VALIDATE is not None:
+                    try:
+                        _VALIDATE(parsed_json)
+                        out("✅ Schema validated in one compiled pass (all required fields and types OK)\n")
+                        validated = True
+                    except fastjsonschema.JsonSchemaException as e:
+                        out(f"⚠️ Schema validation failed: {e.message}\n")
+
+                if not validated:
+                    # Check each recipe
+                    for i, recipe in enumerate(recipes, 1):
+                        out(f"\n📝 Recipe {i}: {recipe.get('recipe_name', 'NO NAME')}\n")
+
+                        # Check required fields: bucket each field into ok /
+                        # wrong-type / missing, then report the buckets in one go
+                        missing, wrong, ok = [], [], []
+                        for field, expected_type in REQUIRED_FIELDS:
+                            value = recipe.get(field, _MISSING)
+                            if value is _MISSING:
+                                missing.append(field)
+                            elif isinstance(value, expected_type):
+                                ok.append(field)
                             else:
-                                print(f"    ❌ {nfield}: MISSING")
-                
+                                wrong.append(f"{field} ({type(value).__name__}, expected {expected_type.__name__})")
+
+                        if ok:
+                            out(f"  ✅ OK: {', '.join(ok)}\n")
+                        if wrong:
+                            out(f"  ⚠️ WRONG TYPE: {', '.join(wrong)}\n")
+                        if missing:
+                            out(f"  ❌ MISSING: {', '.join(missing)}\n")
+
+                        # Check nutritional info specifically
+                        if 'nutritional_info' in recipe:
+                            nutrition = recipe['nutritional_info']
+                            nutrition_fields = ['calories_per_serving', 'protein_grams', 'carbs_grams', 'fat_grams']
+                            out(f"  📊 Nutritional Info Check:\n")
+                            for nfield in nutrition_fields:
+                                if nfield in nutrition:
+                                    out(f"    ✅ {nfield}: {nutrition[nfield]}\n")
+                                else:
+                                    out(f"    ❌ {nfield}: MISSING\n")
+
                 # Summary
-                print(f"\n🎯 SUMMARY:")
-                print(f"✅ Generated {len(recipes)} recipes (requirement: 2-3)")
-                print(f"✅ JSON format enforced and parsed successfully")
-                print(f"✅ All recipes include cooking time and difficulty")
-                print(f"✅ Nutritional information provided per recipe")
-                
+                out(f"\n🎯 SUMMARY:\n")
+                out(f"✅ Generated {len(recipes)} recipes (requirement: 2-3)\n")
+                out(f"✅ JSON format enforced and parsed successfully\n")
+                out(f"✅ All recipes include cooking time and difficulty\n")
+                out(f"✅ Nutritional information provided per recipe\n")
+
             else:
-                print("❌ No 'recipes' key found in response!")
-                
+                out("❌ No 'recipes' key found in response!\n")
+
+            sys.stdout.write(buf.getvalue())
+            sys.stdout.flush()
+
         except json.JSONDecodeError as e:
             print(f"❌ JSON PARSING FAILED: {e}")
             print("The LLM response is not valid JSON")
@@ -211,6 +334,11 @@ def show_requirements_check():
     print("  6. ✅ Show raw LLM output for debugging")
 
 if __name__ == "__main__":
+    # Block-buffer stdout so print doesn't flush per line on a TTY; the
+    # progress markers that should appear immediately pass flush=True, and
+    # the validation report goes out in one write anyway
+    sys.stdout.reconfigure(line_buffering=False)
+
     print("🧪 GEMINI API RECIPE GENERATION TEST")
     print("="*50)
     
@@ -0,0 +1,31 @@
+# tests/conftest.py
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def browser_context(playwright):
+    """
+    One browser and context for the whole session. Browser launch (~1-3s) is
+    the dominant per-test cost with the default function-scoped fixtures, so
+    pay it once and hand out fresh pages instead.
+    """
+    browser = playwright.chromium.launch()
+    context = browser.new_context()
+    yield context
+    context.close()
+    browser.close()
+
+
+@pytest.fixture(scope="session")
+def warm_app(browser_context):
+    """
+    Load the app once up front so tests run against a warm Streamlit server
+    and skip the model-load portion of startup.
+    """
+    page = browser_context.new_page()
+    try:
+        page.goto("http://localhost:8501/")
+        page.get_by_text("AI chef is ready!").wait_for(state="visible", timeout=60000)
+    finally:
+        page.close()